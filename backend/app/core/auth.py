@@ -3,14 +3,22 @@ Authentication middleware and utilities for FastAPI
 Handles Firebase token verification and user authentication
 """
 
+import logging
+
 import firebase_admin
+from anyio import to_thread
 from firebase_admin import auth
-from fastapi import HTTPException, Security, Depends
+from fastapi import HTTPException, Request, Security, Depends
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from typing import Optional, Dict, Any
 from functools import wraps
 
+from .token_cache import get_cached_user, cache_user
+
+logger = logging.getLogger(__name__)
+
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
 class AuthUser:
@@ -25,7 +33,32 @@ class AuthUser:
         return f"<AuthUser uid={self.uid} email={self.email}>"
 
 
-async def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> AuthUser:
+async def _verify_token(token: str) -> AuthUser:
+    """
+    Verify a raw Firebase ID token and return the user it belongs to
+    Plain helper (not a FastAPI dependency); Firebase errors propagate to the caller
+    """
+    # Reuse a recent verification of the same token
+    cached_user = get_cached_user(token)
+    if cached_user is not None:
+        return cached_user
+    
+    # Verify the token with Firebase Admin SDK (blocking, so keep it off the event loop)
+    decoded_token = await to_thread.run_sync(auth.verify_id_token, token)
+    
+    user = AuthUser(
+        uid=decoded_token['uid'],
+        email=decoded_token.get('email', ''),
+        token_data=decoded_token
+    )
+    cache_user(token, user, decoded_token['exp'])
+    return user
+
+
+async def verify_firebase_token(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Security(security)
+) -> AuthUser:
     """
     Verify Firebase ID token from Authorization header
     
@@ -35,16 +68,10 @@ async def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Secu
             return {"message": f"Hello {user.email}"}
     """
     try:
-        token = credentials.credentials
-        
-        # Verify the token with Firebase Admin SDK
-        decoded_token = auth.verify_id_token(token)
-        
-        return AuthUser(
-            uid=decoded_token['uid'],
-            email=decoded_token.get('email', ''),
-            token_data=decoded_token
-        )
+        user = await _verify_token(credentials.credentials)
+        # Lets per-user rate limiting key on the uid
+        request.state.user = user
+        return user
         
     except auth.InvalidIdTokenError:
         raise HTTPException(
@@ -64,7 +91,7 @@ async def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Secu
 
 
 async def get_current_user_optional(
-    credentials: Optional[HTTPAuthorizationCredentials] = Security(HTTPBearer(auto_error=False))
+    credentials: Optional[HTTPAuthorizationCredentials] = Security(optional_security)
 ) -> Optional[AuthUser]:
     """
     Get current user if authenticated, otherwise return None
@@ -74,11 +101,27 @@ async def get_current_user_optional(
         return None
     
     try:
-        return await verify_firebase_token(credentials)
-    except HTTPException:
+        return await _verify_token(credentials.credentials)
+    except Exception:
         return None
 
 
+def warm_up_token_verifier() -> None:
+    """
+    Fetch Google's public signing certificates ahead of the first request
+    The Admin SDK otherwise downloads them lazily inside verify_id_token().
+    They are kept in the verifier's HTTP cache (honouring Cache-Control).
+    """
+    try:
+        token_verifier = auth._get_client(firebase_admin.get_app())._token_verifier
+        id_token_verifier = token_verifier.id_token_verifier
+        token_verifier.request(id_token_verifier.cert_url, method='GET')
+        logger.info("✅ Firebase token certificates preloaded.")
+    except Exception as e:
+        # Not fatal: the SDK will fetch them on the first verification
+        logger.warning("⚠️ Could not preload Firebase token certificates: %s", e)
+
+
 def require_role(allowed_roles: list):
     """
     Decorator to require specific user roles
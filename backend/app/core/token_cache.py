@@ -0,0 +1,53 @@
+"""
+In-process cache for verified Firebase ID tokens
+Lets repeated requests with the same token skip RS256 signature verification
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Optional
+
+from cachetools import TTLCache
+
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "5"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+_lock = threading.Lock()
+
+
+def _key(token: str) -> bytes:
+    # Never keep raw tokens around in memory as dict keys
+    return hashlib.sha256(token.encode()).digest()
+
+
+def get_cached_user(token: str) -> Optional[Any]:
+    """
+    Return the user cached for this token, or None on a miss
+    Entries are dropped as soon as the token itself expires
+    """
+    key = _key(token)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+
+        user, expires_at = entry
+        if expires_at <= time.time():
+            _cache.pop(key, None)
+            return None
+        return user
+
+
+def cache_user(token: str, user: Any, token_exp: float) -> None:
+    """
+    Cache a verified user until min(token expiry, now + AUTH_CACHE_TTL)
+    """
+    expires_at = min(token_exp, time.time() + AUTH_CACHE_TTL)
+    if expires_at <= time.time():
+        return
+
+    with _lock:
+        _cache[_key(token)] = (user, expires_at)
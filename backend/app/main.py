@@ -1,16 +1,37 @@
 import firebase_admin
-from firebase_admin import credentials, firestore
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+from firebase_admin import credentials, firestore, storage
+from google.api_core.exceptions import FailedPrecondition, NotFound
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, BackgroundTasks, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+from anyio import to_thread
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from slowapi import Limiter, _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+from slowapi.util import get_remote_address
+from typing import List, Optional, Dict, Any, Tuple
+import asyncio
 import datetime
+import hashlib
+import json
+import logging
 import os
+import threading
+from functools import lru_cache, partial
+import orjson
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
 # 1. LOAD ENVIRONMENT VARIABLES (Reads your .env file)
-load_dotenv() 
+load_dotenv()
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+logger = logging.getLogger(__name__)
+# httpx logs every request URL at INFO, and the Adzuna credentials are query parameters
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("httpcore").setLevel(logging.WARNING)
 
 # --- IMPORTS FROM YOUR CUSTOM MODULES ---
 # We use try/except to handle running this script from different locations
@@ -18,72 +39,205 @@ try:
     from app.services.pdf_parser import extract_text_from_pdf
     from app.services.ai_matcher import analyze_resume_with_gemini
     from app.services.job_aggregator import job_aggregator
-    from app.core.auth import verify_firebase_token, get_current_user_optional, AuthUser
+    from app.core.auth import verify_firebase_token, get_current_user_optional, AuthUser, warm_up_token_verifier
 except ImportError:
     try:
         # Fallback for running as a module
         from services.pdf_parser import extract_text_from_pdf
         from services.ai_matcher import analyze_resume_with_gemini
         from services.job_aggregator import job_aggregator
-        from core.auth import verify_firebase_token, get_current_user_optional, AuthUser
+        from core.auth import verify_firebase_token, get_current_user_optional, AuthUser, warm_up_token_verifier
     except ImportError:
-        print("⚠️ Warning: Could not import services. Check your folder structure.")
+        logger.warning("⚠️ Warning: Could not import services. Check your folder structure.")
         def extract_text_from_pdf(bytes_data): return ""
         def analyze_resume_with_gemini(text): return {"error": "AI Module Missing"}
         job_aggregator = None
         verify_firebase_token = None
         get_current_user_optional = None
         AuthUser = None
+        warm_up_token_verifier = None
 
 # 2. INITIALIZE FASTAPI
-app = FastAPI(title="AI Resume Analyzer")
+class ORJSONResponse(JSONResponse):
+    """JSON response encoded with orjson, which is much faster than the stdlib json module"""
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+app = FastAPI(title="AI Resume Analyzer", default_response_class=ORJSONResponse)
+
+# Rate limiting for the expensive routes (PDF parse + Gemini, Adzuna calls).
+# Authenticated callers are limited per user, everyone else per client IP.
+def rate_limit_key(request: Request) -> str:
+    user = getattr(request.state, "user", None)
+    return user.uid if user else get_remote_address(request)
+
+UPLOAD_RATE_LIMIT = os.getenv("UPLOAD_RATE_LIMIT", "5/minute")
+JOBS_RATE_LIMIT = os.getenv("JOBS_RATE_LIMIT", "30/minute")
+# The default in-memory counters are per process: with N workers each limit is
+# really N times higher. Point this at shared storage (e.g. "redis://host:6379",
+# needs the redis package) to run several workers with the configured limits.
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+SHARED_RATE_LIMITS = not RATE_LIMIT_STORAGE_URI.startswith("memory://")
+
+# Worker processes `python -m app.main` runs (see __main__). Computed from the
+# environment, so every worker agrees on it. DEV=1 is a single reload process;
+# otherwise one per core, but only when the rate limits are shared.
+DEV_MODE = bool(int(os.getenv("DEV", "0")))
+WEB_WORKERS = 1 if DEV_MODE else int(os.getenv("WORKERS", (os.cpu_count() or 2) if SHARED_RATE_LIMITS else 1))
+
+limiter = Limiter(key_func=rate_limit_key, storage_uri=RATE_LIMIT_STORAGE_URI)
+app.state.limiter = limiter
+app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 # 3. ENABLE CORS
+# Browsers reject a wildcard origin on credentialed requests, so list them explicitly
+# (comma-separated ALLOWED_ORIGINS; defaults cover the bundled frontend)
+ALLOWED_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv("ALLOWED_ORIGINS", "http://localhost:8000,http://127.0.0.1:8000").split(",")
+    if origin.strip()
+]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"], 
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Compress larger JSON bodies (job lists, AI analysis); small ones aren't worth it.
+# Added last, so it's the outermost middleware and sees requests before CORS.
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # 4. SERVE FRONTEND (Optional)
 # This serves your index.html at http://localhost:8000/static/index.html
 if os.path.exists("../frontend"):
     app.mount("/static", StaticFiles(directory="../frontend", html=True), name="static")
 
 # 5. INITIALIZE FIREBASE (Defensive Code)
-db = None 
+# Done lazily (once per process) instead of at import time
+@lru_cache(maxsize=1)
+def get_db():
+    """Initialize Firebase on first use and return the Firestore client (None if unavailable)"""
+    try:
+        if not firebase_admin._apps:
+            # Robust path finding for serviceAccountKey.json
+            backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            service_account_path = os.path.join(backend_dir, "serviceAccountKey.json")
+            
+            if os.path.exists(service_account_path):
+                cred = credentials.Certificate(service_account_path)
+                firebase_admin.initialize_app(cred)
+                logger.info("✅ Firebase initialized successfully.")
+            else:
+                logger.error("❌ Error: 'serviceAccountKey.json' not found at %s", service_account_path)
 
-try:
-    if not firebase_admin._apps:
-        # Robust path finding for serviceAccountKey.json
-        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        service_account_path = os.path.join(backend_dir, "serviceAccountKey.json")
-        
-        if os.path.exists(service_account_path):
-            cred = credentials.Certificate(service_account_path)
-            firebase_admin.initialize_app(cred)
-            print("✅ Firebase initialized successfully.")
-        else:
-            print(f"❌ Error: 'serviceAccountKey.json' not found at {service_account_path}")
+        if firebase_admin._apps:
+            return firestore.client()
 
-    if firebase_admin._apps:
-        db = firestore.client()
-    else:
-        print("⚠️ Warning: Firebase App not initialized. DB operations will fail.")
+        logger.warning("⚠️ Warning: Firebase App not initialized. DB operations will fail.")
+        return None
+
+    except Exception as e:
+        logger.error("❌ Firebase Connection Error: %s", e)
+        return None
+
+# Uploads larger than this are rejected before any parsing happens
+MAX_PDF_BYTES = int(os.getenv("MAX_PDF_BYTES", 10 * 1024 * 1024))
+
+# Only this much of the parsed text is kept on the resume document itself
+RESUME_PREVIEW_CHARS = 500
 
-except Exception as e:
-    print(f"❌ Firebase Connection Error: {e}")
-    db = None
+# When set, full resume text goes to this Cloud Storage bucket instead of Firestore
+RESUME_TEXT_BUCKET = os.getenv("RESUME_TEXT_BUCKET")
+
+# Short-lived cache for GET /get-resume (the frontend re-reads right after uploading)
+RESUME_CACHE = TTLCache(maxsize=5000, ttl=int(os.getenv("RESUME_CACHE_TTL", "30")))
+resume_cache_lock = threading.Lock()
+
+# Short-lived cache of users/{uid} documents for the auth and role checks.
+# invalidate_user_doc only clears this process's copy, so with several workers a
+# profile or role change would stay invisible to the others for up to the TTL;
+# the cache is therefore off by default unless there is a single worker.
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "30" if WEB_WORKERS == 1 else "0"))
+USER_CACHE = TTLCache(maxsize=10_000, ttl=max(USER_CACHE_TTL, 1))
+user_cache_lock = threading.Lock()
+
+def get_user_snapshot(uid: str) -> Optional[Tuple[Dict[str, Any], Any]]:
+    """
+    Cached read of a user's profile document (blocking, call from a worker thread)
+    Returns (data, update_time), or None if the profile doesn't exist; misses are
+    not cached, since the frontend creates profiles directly in Firestore.
+    """
+    with user_cache_lock:
+        cached = USER_CACHE.get(uid)
+    if cached is not None:
+        return cached
+
+    user_doc = get_db().collection("users").document(uid).get()
+    if not user_doc.exists:
+        return None
+
+    snapshot = (user_doc.to_dict(), user_doc.update_time)
+    if USER_CACHE_TTL > 0:
+        with user_cache_lock:
+            USER_CACHE[uid] = snapshot
+    return snapshot
+
+def get_user_doc(uid: str) -> Optional[Dict[str, Any]]:
+    """Cached profile data only (see get_user_snapshot)"""
+    snapshot = get_user_snapshot(uid)
+    return snapshot[0] if snapshot else None
+
+def invalidate_user_doc(uid: str):
+    """Drop a cached profile after writing to it"""
+    with user_cache_lock:
+        USER_CACHE.pop(uid, None)
+
+# 6. STARTUP HOOKS
+@app.on_event("startup")
+async def configure_thread_pool():
+    # Blocking SDK calls (token verification, etc.) run in this pool
+    limiter = to_thread.current_default_thread_limiter()
+    limiter.total_tokens = int(os.getenv("THREAD_POOL_SIZE", "64"))
+
+@app.on_event("startup")
+async def preload_token_certificates():
+    # Initialize Firebase now rather than on the first request, then keep the
+    # one-off certificate download out of the first authenticated request
+    await to_thread.run_sync(get_db)
+    if warm_up_token_verifier and firebase_admin._apps:
+        await to_thread.run_sync(warm_up_token_verifier)
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    if job_aggregator:
+        job_aggregator.close()
 
 # --- PYDANTIC MODELS ---
 class ResumeResponse(BaseModel):
+    # Just what the upload page shows; GET /get-resume/{id} has the full analysis
     id: str
     filename: str
-    extracted_text_preview: str
-    ai_analysis: Dict[str, Any] # Holds the full JSON from Gemini
     message: str
+    candidate_name: Optional[str] = None
+    experience_years: Optional[int] = None
+    quality_score: Optional[int] = None
+    skills: List[str] = []
+    summary: Optional[str] = None
+
+# Adzuna supported countries (also served by GET /jobs/locations)
+_SUPPORTED_LOCATIONS = {
+    "US": "United States",
+    "GB": "United Kingdom",
+    "AU": "Australia",
+    "CA": "Canada",
+    "FR": "France",
+    "DE": "Germany",
+    "NL": "Netherlands",
+    "IN": "India",
+    "SG": "Singapore",
+}
 
 class JobFilterRequest(BaseModel):
     """Model for job filtering request"""
@@ -104,6 +258,10 @@ class JobMatchRequest(BaseModel):
     location: str = "US"
     results_per_page: int = 10
     page: int = 1
+    # Consecutive result pages (starting at page) to rank together, fetched concurrently
+    pages: int = 1
+
+MAX_MATCH_PAGES = 5
 
 class UserProfile(BaseModel):
     """Model for user profile data"""
@@ -137,13 +295,14 @@ def health_check():
 async def get_current_user_profile(user: AuthUser = Depends(verify_firebase_token)):
     """Get current authenticated user's profile from Firestore"""
     try:
+        db = get_db()
         if db is None:
             raise HTTPException(status_code=503, detail="Database not initialized")
         
-        user_doc = db.collection("users").document(user.uid).get()
+        user_data = await to_thread.run_sync(get_user_doc, user.uid)
         
-        if user_doc.exists:
-            return {"uid": user.uid, **user_doc.to_dict()}
+        if user_data is not None:
+            return {"uid": user.uid, **user_data}
         else:
             # User authenticated but no profile exists yet
             return {
@@ -161,6 +320,7 @@ async def create_or_update_profile(
 ):
     """Create or update user profile"""
     try:
+        db = get_db()
         if db is None:
             raise HTTPException(status_code=503, detail="Database not initialized")
         
@@ -168,22 +328,56 @@ async def create_or_update_profile(
         profile_data['uid'] = user.uid
         profile_data['email'] = user.email
         profile_data['updatedAt'] = datetime.datetime.utcnow()
+        if 'skills' in profile_data:
+            # Lowercased copy lets /candidates/search match skills inside Firestore
+            profile_data['skills_lc'] = [s.lower() for s in profile_data['skills']]
         
         # Check if profile exists
         user_ref = db.collection("users").document(user.uid)
-        user_doc = user_ref.get()
+        user_doc = await to_thread.run_sync(user_ref.get)
         
         if not user_doc.exists:
             profile_data['createdAt'] = datetime.datetime.utcnow()
-            user_ref.set(profile_data)
+            await to_thread.run_sync(user_ref.set, profile_data)
+            invalidate_user_doc(user.uid)
             return {"message": "Profile created successfully", "profile": profile_data}
         else:
-            user_ref.update(profile_data)
+            await to_thread.run_sync(user_ref.update, profile_data)
+            invalidate_user_doc(user.uid)
             return {"message": "Profile updated successfully", "profile": profile_data}
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def set_open_to_work(db, uid: str, open_to_work: bool):
+    """
+    Role-checked openToWork update in a single write (blocking, call from a worker thread)
+    The write is conditioned on the profile being unchanged since the (usually cached)
+    read, so a role change in between can't slip through.
+    """
+    user_ref = db.collection("users").document(uid)
+    for _ in range(2):
+        snapshot = get_user_snapshot(uid)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail="User profile not found")
+
+        user_data, update_time = snapshot
+        if user_data.get('role') != 'job_seeker':
+            raise HTTPException(status_code=403, detail="Only job seekers can set open to work status")
+
+        try:
+            user_ref.update({
+                'openToWork': open_to_work,
+                'updatedAt': datetime.datetime.utcnow()
+            }, option=db.write_option(last_update_time=update_time))
+            invalidate_user_doc(uid)
+            return
+        except FailedPrecondition:
+            # Profile changed since it was read, re-read it and check again
+            invalidate_user_doc(uid)
+
+    raise HTTPException(status_code=409, detail="Profile changed during update, please retry")
+
 @app.patch("/auth/open-to-work")
 async def update_open_to_work(
     request: UpdateOpenToWorkRequest,
@@ -191,32 +385,35 @@ async def update_open_to_work(
 ):
     """Update job seeker's 'open to work' status"""
     try:
+        db = get_db()
         if db is None:
             raise HTTPException(status_code=503, detail="Database not initialized")
         
-        user_ref = db.collection("users").document(user.uid)
-        user_doc = user_ref.get()
-        
-        if not user_doc.exists:
-            raise HTTPException(status_code=404, detail="User profile not found")
-        
-        user_data = user_doc.to_dict()
-        if user_data.get('role') != 'job_seeker':
-            raise HTTPException(status_code=403, detail="Only job seekers can set open to work status")
-        
-        user_ref.update({
-            'openToWork': request.openToWork,
-            'updatedAt': datetime.datetime.utcnow()
-        })
+        await to_thread.run_sync(set_open_to_work, db, user.uid, request.openToWork)
         
         return {
             "message": "Open to work status updated",
             "openToWork": request.openToWork
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+CANDIDATE_FIELDS = [
+    'role', 'openToWork', 'skills', 'experienceYears',
+    'displayName', 'photoURL', 'currentTitle',
+]
+
+# Firestore's limit on values for a single array_contains_any filter
+MAX_SKILL_FILTERS = 10
+
+# The filter combinations below need the composite indexes in firestore.indexes.json
+# (from the repo root: firebase deploy --only firestore:indexes --project <id>),
+# and profiles created before skills_lc existed must be migrated once with
+# backend/backfill_skills_lc.py
+
 @app.get("/candidates/search")
 async def search_candidates(
     skills: Optional[str] = None,
@@ -230,38 +427,44 @@ async def search_candidates(
     Requires authentication and company role
     """
     try:
+        db = get_db()
         if db is None:
             raise HTTPException(status_code=503, detail="Database not initialized")
         
-        # Verify user is a company
-        user_doc = db.collection("users").document(user.uid).get()
-        if not user_doc.exists or user_doc.to_dict().get('role') != 'company':
+        # Verify user is a company (may be up to USER_CACHE_TTL old, see USER_CACHE)
+        user_data = await to_thread.run_sync(get_user_doc, user.uid)
+        if user_data is None or user_data.get('role') != 'company':
             raise HTTPException(status_code=403, detail="Only companies can search candidates")
         
-        # Build query
+        skill_set = frozenset(s.strip().lower() for s in skills.split(',') if s.strip()) if skills else frozenset()
+        # Too many skills for array_contains_any, so match them here instead
+        post_filter_skills = len(skill_set) > MAX_SKILL_FILTERS
+        
+        # Build query - filters run inside Firestore so `limit` applies to matches
         query = db.collection("users").where('role', '==', 'job_seeker')
         
         if open_to_work_only:
             query = query.where('openToWork', '==', True)
         
+        # array_contains_any accepts at most 10 values; longer lists are filtered below
+        if skill_set and not post_filter_skills:
+            query = query.where('skills_lc', 'array_contains_any', sorted(skill_set))
+        
+        if min_experience is not None and min_experience > 0:
+            query = query.where('experienceYears', '>=', min_experience)
+        
+        # Only fetch the public profile fields (no email, resume IDs, etc.)
+        query = query.select(CANDIDATE_FIELDS + ['skills_lc'] if post_filter_skills else CANDIDATE_FIELDS)
+        
+        docs = await to_thread.run_sync(lambda: list(query.limit(limit).stream()))
+        
         candidates = []
-        for doc in query.limit(limit).stream():
+        for doc in docs:
             candidate_data = doc.to_dict()
             
-            # Filter by skills if specified
-            if skills:
-                skill_list = [s.strip().lower() for s in skills.split(',')]
-                candidate_skills = [s.lower() for s in candidate_data.get('skills', [])]
-                if not any(skill in candidate_skills for skill in skill_list):
-                    continue
+            if post_filter_skills and not skill_set.intersection(candidate_data.pop('skills_lc', ())):
+                continue
             
-            # Filter by minimum experience
-            if min_experience is not None:
-                if candidate_data.get('experienceYears', 0) < min_experience:
-                    continue
-            
-            # Remove sensitive data
-            candidate_data.pop('email', None)
             candidates.append({
                 'uid': doc.id,
                 **candidate_data
@@ -276,8 +479,69 @@ async def search_candidates(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def save_resume_stub(doc_ref, stub_data: Dict[str, Any], parsed_text: str):
+    """Create the resume document in 'pending' state (runs while Gemini is working)"""
+    if RESUME_TEXT_BUCKET:
+        # Keep the blob out of Firestore entirely, only its URI goes on the document
+        blob_name = f"resumes/{doc_ref.id}.txt"
+        storage.bucket(RESUME_TEXT_BUCKET).blob(blob_name).upload_from_string(
+            parsed_text, content_type="text/plain; charset=utf-8"
+        )
+        doc_ref.set({**stub_data, "parsed_text_uri": f"gs://{RESUME_TEXT_BUCKET}/{blob_name}"})
+    else:
+        doc_ref.set(stub_data)
+        # The full text lives in a subcollection so normal reads stay small
+        doc_ref.collection("raw").document("text").set({"text": parsed_text})
+
+def load_resume_text(doc_ref) -> Optional[str]:
+    """Full parsed text from Cloud Storage, the raw subcollection or the legacy field (None if missing)"""
+    doc = doc_ref.get(field_paths=["parsed_text_uri", "parsed_text"])
+    if not doc.exists:
+        return None
+
+    data = doc.to_dict() or {}
+    uri = data.get("parsed_text_uri")
+    if uri:
+        bucket_name, _, blob_name = uri.removeprefix("gs://").partition("/")
+        return storage.bucket(bucket_name).blob(blob_name).download_as_text()
+
+    text_doc = doc_ref.collection("raw").document("text").get()
+    if text_doc.exists:
+        return text_doc.to_dict().get("text", "")
+    # Resumes uploaded before the text moved out kept it on the document itself
+    return data.get("parsed_text")
+
+def save_resume(doc_ref, analysis_data: Dict[str, Any], uid: str):
+    """Store the AI analysis and link the resume to its owner (runs after the response is sent)"""
+    try:
+        # One atomic commit (and one round trip) for both documents
+        db = get_db()
+        batch = db.batch()
+        batch.update(doc_ref, analysis_data)
+        batch.update(db.collection("users").document(uid), {
+            'resumeId': doc_ref.id,
+            'updatedAt': datetime.datetime.utcnow()
+        })
+        try:
+            batch.commit()
+        except NotFound:
+            # No profile yet (it's created later from the frontend): the batch is
+            # atomic, so store the analysis on its own rather than lose it
+            logger.debug("👤 No profile for %s yet, saving resume %s unlinked", uid, doc_ref.id)
+            doc_ref.update(analysis_data)
+
+        with resume_cache_lock:
+            RESUME_CACHE.pop(doc_ref.id, None)
+        invalidate_user_doc(uid)
+        logger.info("✅ Saved Analysis to ID: %s", doc_ref.id)
+    except Exception as e:
+        logger.error("❌ Error saving resume %s: %s", doc_ref.id, e)
+
 @app.post("/upload-resume", response_model=ResumeResponse)
+@limiter.limit(UPLOAD_RATE_LIMIT)
 async def upload_resume(
+    request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     user: AuthUser = Depends(verify_firebase_token)
 ):
@@ -285,6 +549,7 @@ async def upload_resume(
     Receives PDF -> Extracts Text -> Sends to Gemini -> Saves JSON to Firebase
     """
     # Safety Check: Database
+    db = get_db()
     if db is None:
         raise HTTPException(status_code=503, detail="Database not initialized")
 
@@ -293,27 +558,48 @@ async def upload_resume(
         raise HTTPException(status_code=400, detail="Invalid file type. Only PDFs allowed.")
 
     try:
-        # Step A: Read File
-        file_content = await file.read()
+        # Step A: Check File Size
+        # The upload is already spooled to a temp file, so it's parsed from there
+        # instead of being copied into memory
+        size = file.size if file.size is not None else file.file.seek(0, os.SEEK_END)
+        if size > MAX_PDF_BYTES:
+            raise HTTPException(status_code=413, detail="PDF is too large.")
+        file.file.seek(0)
+        
+        # The content type is client-supplied, so also check the PDF signature
+        # before handing the file to the (expensive) parser
+        if file.file.read(5) != b"%PDF-":
+            raise HTTPException(status_code=400, detail="Not a valid PDF file.")
+        file.file.seek(0)
         
         # Step B: Extract Text (using pdf_parser.py)
-        extracted_text = extract_text_from_pdf(file_content)
+        # Parsing and the Gemini call are blocking, so both run in the thread pool
+        extracted_text = await to_thread.run_sync(extract_text_from_pdf, file.file)
         if not extracted_text:
             raise HTTPException(status_code=400, detail="Failed to extract text from PDF.")
 
         # Step C: CALL GEMINI API 🧠 (using ai_matcher.py)
         # Note: The API Key is loaded automatically inside ai_matcher.py or via load_dotenv() here
-        print(f"🤖 Sending {len(extracted_text)} chars to Gemini...")
-        ai_result = analyze_resume_with_gemini(extracted_text)
+        # The ID is generated client-side, so the 'pending' document can be written
+        # to Firestore at the same time as Gemini analyzes the text
+        doc_ref = db.collection("resumes").document()
+        stub_data = {
+            "user_id": user.uid,  # Link resume to user
+            "filename": file.filename,
+            "upload_timestamp": firestore.SERVER_TIMESTAMP,  # Set by Firestore on commit
+            "status": "pending",
+            "text_preview": extracted_text[:RESUME_PREVIEW_CHARS],
+        }
+        logger.debug("🤖 Sending %d chars to Gemini...", len(extracted_text))
+        _, ai_result = await asyncio.gather(
+            to_thread.run_sync(save_resume_stub, doc_ref, stub_data, extracted_text),
+            to_thread.run_sync(analyze_resume_with_gemini, extracted_text),
+        )
         
         # Step D: Prepare Data for Firebase
         # We merge the AI result directly into our database object
-        resume_data = {
-            "user_id": user.uid,  # Link resume to user
-            "filename": file.filename,
-            "upload_timestamp": datetime.datetime.utcnow(),
+        analysis_data = {
             "status": "analyzed",
-            "parsed_text": extracted_text, 
             # Extract key fields for easier querying in Firebase later
             "candidate_name": ai_result.get("candidate_name", "Unknown"),
             "skills": ai_result.get("skills", []),
@@ -323,47 +609,79 @@ async def upload_resume(
             "full_ai_response": ai_result 
         }
 
-        # Step E: Save to Firestore
-        update_time, doc_ref = db.collection("resumes").add(resume_data)
-        print(f"✅ Saved Analysis to ID: {doc_ref.id}")
-        
-        # Step F: Update user profile with resume ID
-        db.collection("users").document(user.uid).update({
-            'resumeId': doc_ref.id,
-            'updatedAt': datetime.datetime.utcnow()
-        })
+        # Step E: Save the analysis and link it to the user profile after we respond
+        background_tasks.add_task(save_resume, doc_ref, analysis_data, user.uid)
 
         # Step F: Return Response to Frontend
         return {
             "id": doc_ref.id,
             "filename": file.filename,
-            "extracted_text_preview": extracted_text[:100] + "...",
-            "ai_analysis": ai_result,
-            "message": "Resume analyzed successfully!"
+            "message": "Resume analyzed successfully!",
+            "candidate_name": ai_result.get("candidate_name"),
+            "experience_years": ai_result.get("experience_years"),
+            "quality_score": ai_result.get("resume_quality_score"),
+            "skills": ai_result.get("skills", []),
+            "summary": ai_result.get("summary"),
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Error: {e}")
+        logger.error("❌ Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/get-resume/{resume_id}")
 def get_resume(resume_id: str):
     try:
+        db = get_db()
         if db is None:
              raise HTTPException(status_code=503, detail="Database error")
+
+        with resume_cache_lock:
+            cached = RESUME_CACHE.get(resume_id)
+        if cached is not None:
+            return cached
              
         doc = db.collection("resumes").document(resume_id).get()
         if doc.exists:
-            return {"id": doc.id, **doc.to_dict()}
+            resume = {"id": doc.id, **doc.to_dict()}
+            # Only finished analyses are cached: the 'pending' stub is replaced by a
+            # background write (possibly in another worker) that can't evict it here.
+            # Resumes saved before the status field existed were written complete.
+            if resume.get("status", "analyzed") == "analyzed":
+                with resume_cache_lock:
+                    RESUME_CACHE[resume_id] = resume
+            return resume
         else:
             raise HTTPException(status_code=404, detail="Resume not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/get-resume/{resume_id}/raw-text")
+def get_resume_raw_text(resume_id: str):
+    """Full extracted text of a resume, loaded on demand"""
+    try:
+        db = get_db()
+        if db is None:
+            raise HTTPException(status_code=503, detail="Database error")
+
+        parsed_text = load_resume_text(db.collection("resumes").document(resume_id))
+        if parsed_text is not None:
+            return {"id": resume_id, "parsed_text": parsed_text}
+        else:
+            raise HTTPException(status_code=404, detail="Resume text not found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- JOB AGGREGATION ROUTES (MODULE 4) ---
 
 @app.post("/jobs/search")
-async def search_jobs(request: JobFilterRequest):
+@limiter.limit(JOBS_RATE_LIMIT)
+async def search_jobs(request: Request, search: JobFilterRequest):
     """
     🔹 MODULE 4: Fetch jobs from Adzuna API
     
@@ -373,30 +691,35 @@ async def search_jobs(request: JobFilterRequest):
     if not job_aggregator:
         raise HTTPException(status_code=503, detail="Job aggregator service not available")
     
+    # Unsupported countries would only cost an Adzuna round trip to fail
+    if search.location.upper() not in _SUPPORTED_LOCATIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported location: {search.location}")
+    
     try:
         # Step A: Fetch jobs from Adzuna API
-        jobs = job_aggregator.fetch_jobs_from_adzuna(
-            location=request.location,
-            job_title=request.job_title,
-            results_per_page=request.results_per_page,
-            page=request.page
-        )
+        jobs = await to_thread.run_sync(partial(
+            job_aggregator.fetch_jobs_from_adzuna,
+            location=search.location,
+            job_title=search.job_title,
+            results_per_page=search.results_per_page,
+            page=search.page
+        ))
         
         if not jobs:
             return {"jobs": [], "total": 0, "message": "No jobs found matching your criteria"}
         
         # Step B: Apply filters
         filters = {
-            "min_salary": request.min_salary,
-            "max_salary": request.max_salary,
-            "job_types": request.job_types,
-            "required_skills": request.required_skills,
-            "location_keywords": request.location_keywords,
+            "min_salary": search.min_salary,
+            "max_salary": search.max_salary,
+            "job_types": search.job_types,
+            "required_skills": search.required_skills,
+            "location_keywords": search.location_keywords,
         }
         
         filtered_jobs = job_aggregator.filter_jobs(jobs, filters)
         
-        print(f"✅ Found {len(filtered_jobs)} jobs after filtering")
+        logger.debug("✅ Found %d jobs after filtering", len(filtered_jobs))
         
         return {
             "jobs": filtered_jobs,
@@ -405,12 +728,20 @@ async def search_jobs(request: JobFilterRequest):
         }
         
     except Exception as e:
-        print(f"❌ Error searching jobs: {e}")
+        logger.error("❌ Error searching jobs: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+RESUME_MATCH_FIELDS = [
+    "full_ai_response.candidate_name",
+    "full_ai_response.skills",
+    "full_ai_response.experience_years",
+]
+
 @app.post("/jobs/match-resume")
+@limiter.limit(JOBS_RATE_LIMIT)
 async def match_jobs_to_resume(
-    request: JobMatchRequest,
+    request: Request,
+    match: JobMatchRequest,
     user: AuthUser = Depends(verify_firebase_token)
 ):
     """
@@ -422,42 +753,53 @@ async def match_jobs_to_resume(
     if not job_aggregator:
         raise HTTPException(status_code=503, detail="Job aggregator service not available")
     
+    db = get_db()
     if db is None:
         raise HTTPException(status_code=503, detail="Database not initialized")
     
     try:
-        # Step A: Get resume data from Firebase
-        doc = db.collection("resumes").document(request.resume_id).get()
+        # Step A: Get resume data from Firebase (only the fields used for matching)
+        # and fetch jobs from Adzuna at the same time, they don't depend on each other
+        doc, jobs = await asyncio.gather(
+            to_thread.run_sync(partial(
+                db.collection("resumes").document(match.resume_id).get,
+                field_paths=RESUME_MATCH_FIELDS
+            )),
+            to_thread.run_sync(job_aggregator.fetch_jobs_batch, [
+                {
+                    "location": "US",
+                    "job_title": match.job_title,
+                    "results_per_page": match.results_per_page,
+                    "page": match.page + offset,
+                }
+                for offset in range(max(1, min(match.pages, MAX_MATCH_PAGES)))
+            ])
+        )
         if not doc.exists:
             raise HTTPException(status_code=404, detail="Resume not found")
         
+        # Flatten the pages, dropping a job that shifted onto the next page meanwhile
+        jobs = list({job.get("id") or id(job): job for page_jobs in jobs for job in page_jobs}.values())
+        
         resume_data = doc.to_dict()
         ai_analysis = resume_data.get("full_ai_response", {})
         
         resume_skills = ai_analysis.get("skills", [])
         experience_years = ai_analysis.get("experience_years", 0)
         
-        print(f"👤 Matching jobs for candidate with {len(resume_skills)} skills and {experience_years} years experience")
-        
-        # Step B: Fetch jobs from Adzuna
-        jobs = job_aggregator.fetch_jobs_from_adzuna(
-            location="US",
-            job_title=request.job_title,
-            results_per_page=request.results_per_page,
-            page=request.page
-        )
+        logger.debug("👤 Matching jobs for candidate with %d skills and %s years experience", len(resume_skills), experience_years)
         
         if not jobs:
             return {"jobs": [], "total": 0, "message": "No jobs found"}
         
-        # Step C: Score and rank jobs based on resume match
+        # Step B: Score and rank jobs based on resume match
         matched_jobs = job_aggregator.match_jobs_to_resume(
             jobs,
             resume_skills,
             experience_years
         )
         
-        print(f"✅ Ranked {len(matched_jobs)} jobs for resume match")
+        logger.debug("✅ Ranked %d jobs for resume match", len(matched_jobs))
         
         return {
             "candidate_name": ai_analysis.get("candidate_name", "Unknown"),
@@ -468,29 +810,44 @@ async def match_jobs_to_resume(
             "message": f"Found {len(matched_jobs)} matching job opportunities"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Error matching jobs: {e}")
+        logger.error("❌ Error matching jobs: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+# The supported locations never change at runtime, so the response is built once
+_LOCATIONS_JSON = json.dumps({"locations": _SUPPORTED_LOCATIONS}).encode()
+_LOCATIONS_ETAG = f'"{hashlib.md5(_LOCATIONS_JSON).hexdigest()}"'
+_LOCATIONS_HEADERS = {
+    "ETag": _LOCATIONS_ETAG,
+    "Cache-Control": "public, max-age=86400, immutable",
+}
+
 @app.get("/jobs/locations")
-async def get_supported_locations():
+async def get_supported_locations(request: Request):
     """
     Get list of supported job search locations (Adzuna supported countries)
     """
-    locations = {
-        "US": "United States",
-        "GB": "United Kingdom",
-        "AU": "Australia",
-        "CA": "Canada",
-        "FR": "France",
-        "DE": "Germany",
-        "NL": "Netherlands",
-        "IN": "India",
-        "SG": "Singapore",
-    }
-    return {"locations": locations}
+    if request.headers.get("if-none-match") == _LOCATIONS_ETAG:
+        return Response(status_code=304, headers=_LOCATIONS_HEADERS)
+    return Response(_LOCATIONS_JSON, media_type="application/json", headers=_LOCATIONS_HEADERS)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    # Worker count is WEB_WORKERS: with in-memory counters every worker would
+    # enforce its own copy of the rate limits, so it defaults to one.
+    # uvicorn picks uvloop/httptools automatically when installed.
+    if WEB_WORKERS > 1 and not SHARED_RATE_LIMITS:
+        logger.warning(
+            "⚠️ %d workers with in-memory rate limits: each limit is effectively %dx higher. "
+            "Set RATE_LIMIT_STORAGE_URI to shared storage.", WEB_WORKERS, WEB_WORKERS
+        )
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=DEV_MODE,
+        workers=None if DEV_MODE else WEB_WORKERS,
+    )
     
\ No newline at end of file
@@ -1,8 +1,118 @@
 import os
 import google.generativeai as genai
-from typing import Dict, Any
+from google.api_core.exceptions import NotFound
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
 import json
-import re
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Configure Gemini once per process, so every upload shares the same client
+# and its pooled HTTPS connection (REST avoids per-process gRPC channel setup)
+genai.configure(api_key=os.getenv("GEMINI_API_KEY"), transport=os.getenv("GEMINI_TRANSPORT", "rest"))
+
+# Model used directly, without asking the API what's available
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+
+# Serializes first-time model discovery across concurrent uploads
+_model_lock = threading.Lock()
+# Set once GEMINI_MODEL turns out not to exist for this API key
+_use_discovered_model = False
+
+# Longer resumes are trimmed to their head and tail before going to Gemini;
+# contact details and education usually sit at one end or the other
+MAX_RESUME_CHARS = int(os.getenv("MAX_RESUME_CHARS", "15000"))
+_TAIL_CHARS = MAX_RESUME_CHARS // 3
+
+# Gemini returns JSON matching this schema directly, so no cleanup/salvage is needed
+_GENERATION_CONFIG = genai.types.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema={
+        "type": "object",
+        "properties": {
+            "candidate_name": {"type": "string"},
+            "skills": {"type": "array", "items": {"type": "string"}},
+            "experience_years": {"type": "integer"},
+            "resume_quality_score": {"type": "integer"},
+            "summary": {"type": "string"},
+        },
+        "required": ["candidate_name", "skills", "experience_years"],
+    },
+)
+
+@lru_cache(maxsize=1)
+def _default_model() -> Tuple[Any, str]:
+    """
+    The configured GEMINI_MODEL (no network round trip needed)
+    """
+    return genai.GenerativeModel(GEMINI_MODEL), GEMINI_MODEL
+
+@lru_cache(maxsize=1)
+def _discover_model() -> Tuple[Optional[Any], Optional[str]]:
+    """
+    Resolve a working model by listing what the API key can use, once per process.
+    Returns (model, model_name), or (None, None) if no model could be found.
+    """
+    # Try to find a working model
+    model = None
+    model_name = None
+    
+    # First, list all available models
+    logger.debug("📋 Checking available Gemini models...")
+    try:
+        available_models = list(genai.list_models())
+        for m in available_models:
+            if 'generateContent' in m.supported_generation_methods:
+                logger.debug("   ✅ Found: %s", m.name)
+                model_name = m.name
+                model = genai.GenerativeModel(model_name)
+                logger.info("🎯 Using model: %s", model_name)
+                break
+    except Exception as e:
+        logger.warning("⚠️ Error listing models: %s", e)
+    
+    # Fallback to hardcoded model names if listing fails
+    if not model:
+        logger.warning("⚠️ Trying fallback model names...")
+        model_names = ['gemini-1.5-flash', 'gemini-pro', 'models/gemini-pro']
+        for name in model_names:
+            try:
+                logger.debug("   Trying: %s", name)
+                model = genai.GenerativeModel(name)
+                model_name = name
+                logger.info("   ✅ Success with %s", name)
+                break
+            except Exception as e:
+                logger.debug("   ❌ Failed: %s", e)
+                continue
+    
+    return model, model_name
+
+def _get_model() -> Tuple[Optional[Any], Optional[str]]:
+    """
+    The model to use for the next request (see _default_model / _discover_model)
+    """
+    with _model_lock:
+        if not _use_discovered_model:
+            return _default_model()
+
+        model, model_name = _discover_model()
+        if not model:
+            # Don't remember the failure, so the next upload tries again
+            _discover_model.cache_clear()
+        return model, model_name
+
+def _fall_back_to_discovery(model_name: str) -> Tuple[Optional[Any], Optional[str]]:
+    """
+    Switch to list_models() discovery after the configured model was not found
+    """
+    global _use_discovered_model
+    logger.warning("⚠️ Model %s not found, discovering available models...", model_name)
+    with _model_lock:
+        _use_discovered_model = True
+    return _get_model()
 
 def analyze_resume_with_gemini(text: str) -> Dict[str, Any]:
     """
@@ -10,49 +120,17 @@ def analyze_resume_with_gemini(text: str) -> Dict[str, Any]:
     """
     try:
         # Get API key from environment
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
+        if not os.getenv("GEMINI_API_KEY"):
             return {"error": "GEMINI_API_KEY not found in environment variables"}
 
-        # Configure Gemini
-        genai.configure(api_key=api_key)
-
-        # Try to find a working model
-        model = None
-        model_name = None
-        
-        # First, list all available models
-        print("📋 Checking available Gemini models...")
-        try:
-            available_models = list(genai.list_models())
-            for m in available_models:
-                if 'generateContent' in m.supported_generation_methods:
-                    print(f"   ✅ Found: {m.name}")
-                    model_name = m.name
-                    model = genai.GenerativeModel(model_name)
-                    print(f"🎯 Using model: {model_name}")
-                    break
-        except Exception as e:
-            print(f"⚠️ Error listing models: {e}")
-        
-        # Fallback to hardcoded model names if listing fails
-        if not model:
-            print("⚠️ Trying fallback model names...")
-            model_names = ['gemini-pro', 'gemini-1.5-flash', 'models/gemini-pro']
-            for name in model_names:
-                try:
-                    print(f"   Trying: {name}")
-                    model = genai.GenerativeModel(name)
-                    model_name = name
-                    print(f"   ✅ Success with {name}")
-                    break
-                except Exception as e:
-                    print(f"   ❌ Failed: {e}")
-                    continue
-        
+        model, model_name = _get_model()
         if not model:
             return {"error": "Could not find a working Gemini model"}
 
+        if len(text) > MAX_RESUME_CHARS:
+            logger.info("✂️ Truncating resume text from %d to %d chars", len(text), MAX_RESUME_CHARS)
+            text = text[:MAX_RESUME_CHARS - _TAIL_CHARS] + "\n...\n" + text[len(text) - _TAIL_CHARS:]
+
         # Create the prompt for resume analysis
         prompt = f"""
         Analyze the following resume text and extract key information in JSON format:
@@ -71,75 +149,23 @@ def analyze_resume_with_gemini(text: str) -> Dict[str, Any]:
         """
 
         # Generate response
-        print(f"🤖 Generating content with {model_name}...")
-        response = model.generate_content(prompt)
-        result_text = response.text.strip()
-        
-        print(f"✅ Got response: {result_text[:200]}...")
-
-        # Try to parse JSON from response
+        logger.debug("🤖 Generating content with %s...", model_name)
         try:
-            # Remove markdown code blocks if present
-            cleaned_text = re.sub(r'```json\s*|\s*```', '', result_text)
-            cleaned_text = cleaned_text.strip()
-            
-            # Try to find JSON object in the response
-            json_match = re.search(r'\{.*\}', cleaned_text, re.DOTALL)
-            if json_match:
-                cleaned_text = json_match.group(0)
-            
-            # Fix common JSON issues
-            # Remove trailing commas before closing brackets/braces
-            cleaned_text = re.sub(r',(\s*[}\]])', r'\1', cleaned_text)
-            
-            # Parse the JSON
-            ai_result = json.loads(cleaned_text)
-            
-            print(f"✅ Successfully parsed JSON response")
-            
-            return ai_result
-            
-        except json.JSONDecodeError as e:
-            print(f"⚠️ Failed to parse JSON from Gemini response: {e}")
-            print(f"🔍 Cleaned text: {cleaned_text[:500]}...")
-            
-            # Try to extract fields manually as fallback
-            candidate_name = "Unknown"
-            skills = []
-            experience = 0
-            
-            # Extract candidate name
-            name_match = re.search(r'"candidate_name"\s*:\s*"([^"]+)"', result_text)
-            if name_match:
-                candidate_name = name_match.group(1)
-            
-            # Extract skills array
-            skills_match = re.search(r'"skills"\s*:\s*\[(.*?)\]', result_text, re.DOTALL)
-            if skills_match:
-                skills_text = skills_match.group(1)
-                skills = [s.strip(' "\n,') for s in re.findall(r'"([^"]+)"', skills_text)]
-            
-            # Extract experience
-            exp_match = re.search(r'"experience_years"\s*:\s*(\d+)', result_text)
-            if exp_match:
-                experience = int(exp_match.group(1))
-            
-            print(f"📝 Extracted via regex - Name: {candidate_name}, Skills: {len(skills)}, Exp: {experience}")
-            
-            # Return a structured fallback with extracted data
-            return {
-                "candidate_name": candidate_name,
-                "skills": skills,
-                "experience_years": experience,
-                "resume_quality_score": 5,
-                "summary": "Analysis complete (parsed with fallback method)",
-                "raw_response": result_text[:1000],
-                "parse_note": "Used regex extraction due to JSON format issues"
-            }
+            response = model.generate_content(prompt, generation_config=_GENERATION_CONFIG)
+        except NotFound:
+            if model_name != GEMINI_MODEL:
+                raise
+            model, model_name = _fall_back_to_discovery(model_name)
+            if not model:
+                return {"error": "Could not find a working Gemini model"}
+            response = model.generate_content(prompt, generation_config=_GENERATION_CONFIG)
+        ai_result = json.loads(response.text)
+        
+        logger.debug("✅ Successfully parsed JSON response")
+        
+        return ai_result
 
     except Exception as e:
-        print(f"❌ AI Analysis Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ AI Analysis Error: %s", e)
         return {"error": f"AI Analysis failed: {str(e)}"}
     
\ No newline at end of file
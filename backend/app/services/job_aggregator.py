@@ -4,11 +4,58 @@ Fetches real-time job listings from multiple sources
 Normalizes and filters jobs based on user preferences
 """
 
+import heapq
+import logging
 import os
-import requests
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+import httpx
 from typing import List, Dict, Any, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 import json
+from cachetools import TTLCache
+
+try:
+    # Rust Aho-Corasick: finds every keyword in a single pass over the text
+    import ahocorasick_rs
+except ImportError:
+    ahocorasick_rs = None
+
+logger = logging.getLogger(__name__)
+
+# Required experience in a description, e.g. "3 years", "5+ years", "1 year"
+_YEARS_RE = re.compile(r"\b(\d{1,2})\s*\+?\s*years?\b")
+
+# Common tech skills looked for in job descriptions (lowercase)
+TECH_KEYWORDS = [
+    "python", "javascript", "java", "c++", "c#", "ruby", "go", "rust",
+    "react", "angular", "vue", "node", "django", "flask", "spring",
+    "aws", "azure", "gcp", "kubernetes", "docker", "jenkins",
+    "sql", "mongodb", "postgresql", "mysql", "redis",
+    "machine learning", "ai", "deep learning", "nlp",
+    "rest api", "graphql", "microservices", "devops",
+    "git", "github", "gitlab", "agile", "scrum",
+]
+
+def _required_years(description: str) -> int:
+    """Years of experience a description asks for: the first "3 years" / "3+ years", else 0"""
+    years_match = _YEARS_RE.search(description.lower())
+    return int(years_match.group(1)) if years_match else 0
+
+def _posted_timestamp(posted_date: str) -> Optional[float]:
+    """UTC epoch seconds of an ISO posted_date (offset ignored, as before), None if unparseable"""
+    try:
+        posted = datetime.fromisoformat(posted_date.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    return posted.replace(tzinfo=timezone.utc).timestamp()
+
+def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a job without the precomputed "_" fields used internally for matching"""
+    return {k: v for k, v in job.items() if not k.startswith("_")}
 
 class JobAggregator:
     """
@@ -22,6 +69,41 @@ class JobAggregator:
         self.adzuna_app_key = os.getenv("ADZUNA_APP_KEY", "")
         self.adzuna_base_url = "https://api.adzuna.com/v1/api/jobs"
         
+        # One pooled HTTP/2 client for all Adzuna calls: concurrent searches are
+        # multiplexed over a warm connection instead of a TLS handshake each.
+        # Failed connection attempts are retried. httpx already asks for gzip/deflate
+        # (plus br/zstd when those packages are installed) by default.
+        self._client = httpx.Client(
+            transport=httpx.HTTPTransport(
+                http2=True,
+                retries=int(os.getenv("ADZUNA_CONNECT_RETRIES", "2")),
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=10)
+            ),
+            timeout=10.0
+        )
+        # Fan-out pool for multi-page / multi-country searches (network-bound)
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("ADZUNA_FETCH_WORKERS", "8")),
+            thread_name_prefix="adzuna"
+        )
+        
+        # Identical searches within the TTL reuse the previous Adzuna response.
+        # For a while after that the old response is still served immediately
+        # while a background refresh fetches a new one (stale-while-revalidate).
+        self._cache_ttl = int(os.getenv("ADZUNA_CACHE_TTL", "60"))
+        self._cache_stale = int(os.getenv("ADZUNA_CACHE_STALE", "600"))
+        self._cache = TTLCache(maxsize=1024, ttl=self._cache_ttl + self._cache_stale)
+        self._cache_lock = threading.Lock()
+        self._refreshing = set()
+        # One lock per search being fetched, so concurrent identical
+        # searches wait for a single Adzuna call instead of all making one
+        self._fetch_locks: Dict[tuple, threading.Lock] = {}
+        
+        # Built once and shared by every description scan
+        self._keyword_display = [keyword.title() for keyword in TECH_KEYWORDS]
+        self._keyword_bit = {keyword: 1 << i for i, keyword in enumerate(TECH_KEYWORDS)}
+        self._keyword_matcher = ahocorasick_rs.AhoCorasick(TECH_KEYWORDS) if ahocorasick_rs else None
+        
     def fetch_jobs_from_adzuna(
         self, 
         location: str = "US",
@@ -42,9 +124,62 @@ class JobAggregator:
             List of normalized job dictionaries
         """
         if not self.adzuna_app_id or not self.adzuna_app_key:
-            print("⚠️ Warning: Adzuna API credentials not set. Set ADZUNA_APP_ID and ADZUNA_APP_KEY")
+            logger.warning("⚠️ Warning: Adzuna API credentials not set. Set ADZUNA_APP_ID and ADZUNA_APP_KEY")
             return []
         
+        cache_key = (location.lower(), (job_title or "").strip().lower(), results_per_page, page)
+        refresh = False
+        with self._cache_lock:
+            entry = self._cache.get(cache_key)
+            if entry is None:
+                fetch_lock = self._fetch_locks.setdefault(cache_key, threading.Lock())
+            elif time.monotonic() - entry[0] >= self._cache_ttl and cache_key not in self._refreshing:
+                self._refreshing.add(cache_key)
+                refresh = True
+        
+        if refresh:
+            self._executor.submit(self._refresh, cache_key, location, job_title, results_per_page, page)
+        
+        if entry is None:
+            with fetch_lock:
+                # Another thread may have fetched it while we waited
+                with self._cache_lock:
+                    entry = self._cache.get(cache_key)
+                if entry is None:
+                    jobs = self._request_adzuna(location, job_title, results_per_page, page)
+                    with self._cache_lock:
+                        if jobs is not None:
+                            entry = self._cache[cache_key] = (time.monotonic(), jobs)
+                        self._fetch_locks.pop(cache_key, None)
+            if entry is None:
+                return []
+        
+        # Callers annotate jobs in place, so hand out copies
+        return [dict(job) for job in entry[1]]
+    
+    def _refresh(self, cache_key: tuple, *search_args):
+        """
+        Background re-fetch of a stale cache entry (keeps the old one if Adzuna fails)
+        """
+        try:
+            jobs = self._request_adzuna(*search_args)
+            if jobs is not None:
+                with self._cache_lock:
+                    self._cache[cache_key] = (time.monotonic(), jobs)
+        finally:
+            with self._cache_lock:
+                self._refreshing.discard(cache_key)
+    
+    def _request_adzuna(
+        self,
+        location: str,
+        job_title: str,
+        results_per_page: int,
+        page: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Call the Adzuna search API and normalize the results (None on failure, so errors aren't cached)
+        """
         try:
             # Build Adzuna search URL (country code must be lowercase)
             location_lower = location.lower()
@@ -60,8 +195,8 @@ class JobAggregator:
             if job_title:
                 params["what"] = job_title
             
-            print(f"🔍 Fetching jobs from Adzuna for '{job_title or 'all'}' in {location}...")
-            response = requests.get(url, params=params, timeout=10)
+            logger.debug("🔍 Fetching jobs from Adzuna for '%s' in %s...", job_title or 'all', location)
+            response = self._client.get(url, params=params)
             response.raise_for_status()
             
             data = response.json()
@@ -69,16 +204,36 @@ class JobAggregator:
             
             # Normalize Adzuna jobs to our standard format
             normalized_jobs = [self._normalize_adzuna_job(job) for job in jobs]
-            print(f"✅ Fetched {len(normalized_jobs)} jobs from Adzuna")
-            
+            logger.info("✅ Fetched %d jobs from Adzuna", len(normalized_jobs))
             return normalized_jobs
             
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Error fetching from Adzuna: {e}")
-            return []
+        except httpx.HTTPError as e:
+            logger.error("❌ Error fetching from Adzuna: %s", e)
+            return None
         except Exception as e:
-            print(f"❌ Unexpected error: {e}")
-            return []
+            logger.exception("❌ Unexpected error: %s", e)
+            return None
+    
+    def fetch_jobs_batch(self, queries: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Run several Adzuna searches concurrently
+        
+        Args:
+            queries: Keyword arguments for fetch_jobs_from_adzuna, one dict per search
+                     (e.g. [{"location": "US", "page": 1}, {"location": "US", "page": 2}])
+            
+        Returns:
+            One list of normalized jobs per query, in the same order
+        """
+        if len(queries) == 1:
+            return [self.fetch_jobs_from_adzuna(**queries[0])]
+        futures = [self._executor.submit(self.fetch_jobs_from_adzuna, **query) for query in queries]
+        return [future.result() for future in futures]
+    
+    def close(self):
+        """Release pooled HTTP connections and fetch threads"""
+        self._executor.shutdown(wait=False)
+        self._client.close()
     
     def _normalize_adzuna_job(self, raw_job: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -100,7 +255,16 @@ class JobAggregator:
             "url": str,
             "requirements": List[str],  # Extracted from description
         }
+        
+        Also carries "_requirements_lower" (lowercased, NUL-joined requirements),
+        "_req_bits" (one bit per TECH_KEYWORDS index),
+        "_required_years" and "_posted_ts" for filtering/matching; fields
+        starting with "_" are dropped from filter/match results.
         """
+        posted_date = raw_job.get("created", datetime.utcnow().isoformat())
+        description = raw_job.get("description", "")
+        req_bits = self._requirement_bits(description)
+        requirements = self._requirements_from_bits(req_bits)
         return {
             "id": raw_job.get("id", ""),
             "title": raw_job.get("title", ""),
@@ -109,12 +273,17 @@ class JobAggregator:
             "salary_min": raw_job.get("salary_min"),
             "salary_max": raw_job.get("salary_max"),
             "salary_currency": raw_job.get("salary_currency", "USD"),
-            "description": raw_job.get("description", ""),
+            "description": description,
             "job_type": raw_job.get("contract_type", "full-time"),
-            "posted_date": raw_job.get("created", datetime.utcnow().isoformat()),
+            "posted_date": posted_date,
             "source": "adzuna",
             "url": raw_job.get("redirect_url", ""),
-            "requirements": self._extract_requirements(raw_job.get("description", "")),
+            "requirements": requirements,
+            # The NUL separator keeps a skill filter from matching across two requirements
+            "_requirements_lower": "\0".join(requirements).lower(),
+            "_req_bits": req_bits,
+            "_required_years": _required_years(description),
+            "_posted_ts": _posted_timestamp(posted_date),
         }
     
     def _extract_requirements(self, description: str) -> List[str]:
@@ -122,24 +291,37 @@ class JobAggregator:
         Extract key technical requirements/skills from job description
         Simple keyword matching for common tech skills
         """
-        tech_keywords = [
-            "python", "javascript", "java", "c++", "c#", "ruby", "go", "rust",
-            "react", "angular", "vue", "node", "django", "flask", "spring",
-            "aws", "azure", "gcp", "kubernetes", "docker", "jenkins",
-            "sql", "mongodb", "postgresql", "mysql", "redis",
-            "machine learning", "ai", "deep learning", "nlp",
-            "rest api", "graphql", "microservices", "devops",
-            "git", "github", "gitlab", "agile", "scrum",
-        ]
-        
+        return self._requirements_from_bits(self._requirement_bits(description))
+    
+    def _requirement_bits(self, description: str) -> int:
+        """
+        Bitmap of the TECH_KEYWORDS found in a description (bit i = TECH_KEYWORDS[i]),
+        so repeated hits dedupe with a bitwise OR
+        """
         desc_lower = description.lower()
-        found_requirements = []
+        mask = 0
         
-        for keyword in tech_keywords:
-            if keyword in desc_lower:
-                found_requirements.append(keyword.title())
+        if self._keyword_matcher is not None:
+            # Overlapping matches keep plain substring semantics ("javascript" also counts as "java")
+            for i, _, _ in self._keyword_matcher.find_matches_as_indexes(desc_lower, overlapping=True):
+                mask |= 1 << i
+            return mask
         
-        return list(set(found_requirements))  # Remove duplicates
+        for i, keyword in enumerate(TECH_KEYWORDS):
+            if keyword in desc_lower:
+                mask |= 1 << i
+        return mask
+    
+    def _skill_bits(self, skills: List[str]) -> int:
+        """Bitmap of the skills that are TECH_KEYWORDS (case-insensitive); others can't be requirements"""
+        mask = 0
+        for skill in skills:
+            mask |= self._keyword_bit.get(skill.lower(), 0)
+        return mask
+    
+    def _requirements_from_bits(self, mask: int) -> List[str]:
+        """Display names for a requirement bitmap, in TECH_KEYWORDS order"""
+        return [display for i, display in enumerate(self._keyword_display) if mask >> i & 1]
     
     def filter_jobs(
         self,
@@ -163,50 +345,44 @@ class JobAggregator:
         Returns:
             Filtered list of jobs
         """
-        filtered = jobs
-        
-        # Filter by salary range
-        if "min_salary" in filters and filters["min_salary"]:
-            filtered = [
-                j for j in filtered 
-                if j.get("salary_max") is None or j["salary_max"] >= filters["min_salary"]
-            ]
+        min_salary = filters.get("min_salary")
+        max_salary = filters.get("max_salary")
+        job_types = {t.lower() for t in filters.get("job_types") or []}
+        required_skills = [s.lower() for s in filters.get("required_skills") or []]
+        location_keywords = [l.lower() for l in filters.get("location_keywords") or []]
         
-        if "max_salary" in filters and filters["max_salary"]:
-            filtered = [
-                j for j in filtered 
-                if j.get("salary_min") is None or j["salary_min"] <= filters["max_salary"]
-            ]
+        if not (min_salary or max_salary or job_types or required_skills or location_keywords):
+            return [_public(j) for j in jobs]
         
-        # Filter by job type
-        if "job_types" in filters and filters["job_types"]:
-            job_types = [t.lower() for t in filters["job_types"]]
-            filtered = [
-                j for j in filtered 
-                if j.get("job_type", "").lower() in job_types
-            ]
-        
-        # Filter by required skills (must have ALL specified skills)
-        if "required_skills" in filters and filters["required_skills"]:
-            required_skills = [s.lower() for s in filters["required_skills"]]
-            filtered = [
-                j for j in filtered
-                if all(
-                    any(skill.lower() in req.lower() for req in j.get("requirements", []))
-                    for skill in required_skills
-                )
-            ]
-        
-        # Filter by location keywords
-        if "location_keywords" in filters and filters["location_keywords"]:
-            location_keywords = [l.lower() for l in filters["location_keywords"]]
-            filtered = [
-                j for j in filtered
-                if any(
-                    kw in j.get("location", "").lower()
-                    for kw in location_keywords
-                )
-            ]
+        # One pass over the jobs, cheapest checks first
+        filtered = []
+        for j in jobs:
+            # Filter by salary range
+            if min_salary and j.get("salary_max") is not None and j["salary_max"] < min_salary:
+                continue
+            if max_salary and j.get("salary_min") is not None and j["salary_min"] > max_salary:
+                continue
+            
+            # Filter by job type
+            if job_types and j.get("job_type", "").lower() not in job_types:
+                continue
+            
+            # Filter by location keywords (before skills, it's cheaper)
+            if location_keywords:
+                location = j.get("location", "").lower()
+                if not any(kw in location for kw in location_keywords):
+                    continue
+            
+            # Filter by required skills (must have ALL specified skills)
+            if required_skills:
+                # Substring match against any requirement (lowercased at normalization)
+                requirements = j.get("_requirements_lower")
+                if requirements is None:
+                    requirements = "\0".join(j.get("requirements", [])).lower()
+                if not all(skill in requirements for skill in required_skills):
+                    continue
+            
+            filtered.append(_public(j))
         
         return filtered
     
@@ -214,7 +390,8 @@ class JobAggregator:
         self,
         jobs: List[Dict[str, Any]],
         resume_skills: List[str],
-        resume_experience_years: int = 0
+        resume_experience_years: int = 0,
+        top_n: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
         Score jobs based on resume match
@@ -224,38 +401,42 @@ class JobAggregator:
             jobs: List of normalized job dictionaries
             resume_skills: List of skills from the resume
             resume_experience_years: Years of experience from resume
+            top_n: Only return this many of the best matches (None returns every job)
             
         Returns:
             Jobs with match scores, sorted by relevance
         """
         scored_jobs = []
+        # Requirements are always TECH_KEYWORDS, so the resume is reduced to the same
+        # bitmap and a skill match is one AND + popcount (lowercased, in resume order)
+        resume_skill_bits = [
+            (skill, self._keyword_bit[skill])
+            for skill in dict.fromkeys(s.lower() for s in resume_skills)
+            if skill in self._keyword_bit
+        ]
+        resume_bits = 0
+        for _, bit in resume_skill_bits:
+            resume_bits |= bit
+        now = time.time()
         
         for job in jobs:
             score = 0
             
             # 1. Skill matching (40 points max)
-            job_requirements = [r.lower() for r in job.get("requirements", [])]
-            resume_skills_lower = [s.lower() for s in resume_skills]
-            
-            matching_skills = [
-                skill for skill in resume_skills_lower
-                if any(skill in req for req in job_requirements)
-            ]
+            req_bits = job.get("_req_bits")
+            if req_bits is None:
+                req_bits = self._skill_bits(job.get("requirements", []))
+            matched_bits = resume_bits & req_bits
             
-            if job_requirements:
-                skill_match_ratio = len(matching_skills) / len(job_requirements)
+            if req_bits:
+                skill_match_ratio = matched_bits.bit_count() / req_bits.bit_count()
                 score += skill_match_ratio * 40
             
             # 2. Experience level match (30 points max)
-            # Try to extract required experience from job description
-            description = job.get("description", "").lower()
-            required_years = 0
-            
-            # Simple extraction: look for patterns like "3 years" or "3+ years"
-            for i in range(0, 20):
-                if f"{i}+" in description or f"{i} years" in description or f"{i} year" in description:
-                    required_years = i
-                    break
+            # Required experience is parsed from the description once, at normalization
+            required_years = job.get("_required_years")
+            if required_years is None:
+                required_years = _required_years(job.get("description", ""))
             
             if required_years > 0 and resume_experience_years >= required_years:
                 score += 30
@@ -267,13 +448,14 @@ class JobAggregator:
             # 3. Job recency (20 points max)
             posted_date = job.get("posted_date", "")
             if posted_date:
-                try:
-                    posted = datetime.fromisoformat(posted_date.replace("Z", "+00:00"))
-                    days_old = (datetime.utcnow() - posted.replace(tzinfo=None)).days
+                # Parsed once at normalization
+                posted_ts = job["_posted_ts"] if "_posted_ts" in job else _posted_timestamp(posted_date)
+                if posted_ts is not None:
+                    days_old = (now - posted_ts) // 86400
                     # Recent jobs get more points
                     recency_score = max(0, 20 - (days_old / 10))
                     score += recency_score
-                except:
+                else:
                     score += 20  # Default to full points if date parsing fails
             
             # 4. Salary expectation (10 points max)
@@ -281,13 +463,21 @@ class JobAggregator:
             if job.get("salary_max") and job["salary_max"] > 50000:
                 score += 10
             
-            job["match_score"] = round(score, 2)
-            job["matching_skills"] = matching_skills
-            scored_jobs.append(job)
+            scored_jobs.append((round(score, 2), job, matched_bits))
         
-        # Sort by match score descending
-        scored_jobs.sort(key=lambda x: x["match_score"], reverse=True)
-        return scored_jobs
+        # With a top_n only the best are selected instead of sorting everything
+        # (ties keep their original order either way, same as a stable sort)
+        if top_n is None:
+            best = sorted(scored_jobs, key=itemgetter(0), reverse=True)
+        else:
+            best = heapq.nlargest(top_n, scored_jobs, key=itemgetter(0))
+        ranked = []
+        for match_score, job, matched_bits in best:
+            job = _public(job)
+            job["match_score"] = match_score
+            job["matching_skills"] = [skill for skill, bit in resume_skill_bits if matched_bits & bit]
+            ranked.append(job)
+        return ranked
 
 
 # Initialize the aggregator
@@ -1,88 +1,278 @@
+import hashlib
 import io
+import logging
+import os
 import re
-from pdfminer.high_level import extract_text
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, BinaryIO, Callable, Union
+from cachetools import LRUCache
+from pdfminer.high_level import extract_text_to_fp
+from pdfminer.layout import LAParams
 
-def extract_text_from_pdf(file_bytes: bytes) -> str:
+logger = logging.getLogger(__name__)
+
+# OCR backend for scanned PDFs: "tesseract" (default) or "rapidocr"
+# (pip install rapidocr_onnxruntime; uses ONNX Runtime instead of a tesseract process per page)
+OCR_ENGINE = os.getenv("OCR_ENGINE", "tesseract").lower()
+
+# Scanned pages are rendered at this DPI and thresholded to pure black/white
+# before Tesseract sees them (clean resume scans binarize well)
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+OCR_THRESHOLD = int(os.getenv("OCR_THRESHOLD", "180"))
+_BINARIZE_TABLE = [0 if p < OCR_THRESHOLD else 255 for p in range(256)]
+
+# Control and invisible characters that commonly leak out of PDFs
+# (ASCII/C1 controls, soft hyphen, zero-width spaces/joiners, BOM)
+_JUNK_RE = re.compile('[\x00-\x1f\x7f-\x9f\xad\u200b-\u200d\u2060\ufeff]+')
+
+# Resumes are horizontal text; skip vertical-text detection and layout
+# analysis of text inside figures
+_LAPARAMS = LAParams(detect_vertical=False, all_texts=False)
+
+# Extracted text of recently seen PDFs, keyed by content hash
+_extraction_cache = LRUCache(maxsize=int(os.getenv("PDF_CACHE_SIZE", "128")))
+_extraction_cache_lock = threading.Lock()
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# A PDF whose first pages have no more characters than this is treated as scanned
+TEXT_PROBE_PAGES = 3
+TEXT_PROBE_MIN_CHARS = 20
+
+try:
+    # pdfium is several times faster than pdfminer on text-heavy PDFs
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# PDFium is not thread-safe and uploads are parsed on worker threads, so every
+# pdfium call (open, probe, extract, close) is serialized behind this lock
+_pdfium_lock = threading.Lock()
+
+def extract_text_from_pdf(file_bytes: Union[bytes, BinaryIO]) -> str:
     """
-    Takes the raw bytes of a PDF file and returns clean, extracted text.
+    Takes the raw bytes (or a binary file object) of a PDF file and returns clean, extracted text.
     Handles both text-based and image-based (scanned) PDFs using OCR.
+    Re-uploads of the same file are answered from a content-hash cache.
+    """
+    if isinstance(file_bytes, (bytes, bytearray)):
+        pdf_stream = io.BytesIO(file_bytes)
+    else:
+        pdf_stream = file_bytes
+
+    digest = content_digest(pdf_stream)
+    with _extraction_cache_lock:
+        cached = _extraction_cache.get(digest)
+    if cached is not None:
+        logger.info("✅ Reusing extracted text for identical PDF (%d characters)", len(cached))
+        return cached
+
+    text = _extract_text(pdf_stream)
+    # Don't remember failures, they may be transient (e.g. OCR not installed yet)
+    if text and not text.startswith("ERROR:"):
+        with _extraction_cache_lock:
+            _extraction_cache[digest] = text
+    return text
+
+def content_digest(pdf_stream: BinaryIO) -> bytes:
+    """
+    BLAKE2b digest of the whole stream, read in chunks; leaves the stream rewound.
+    """
+    hasher = hashlib.blake2b(digest_size=32)
+    pdf_stream.seek(0)
+    while chunk := pdf_stream.read(_HASH_CHUNK_SIZE):
+        hasher.update(chunk)
+    pdf_stream.seek(0)
+    return hasher.digest()
+
+def _extract_text(pdf_stream: BinaryIO) -> str:
+    """
+    pdfium -> pdfminer -> OCR extraction, uncached (see extract_text_from_pdf).
     """
     try:
-        # 1. Try extracting text using pdfminer.six (for text-based PDFs)
-        print("🔍 Attempting text extraction with pdfminer...")
-        raw_text = extract_text(io.BytesIO(file_bytes))
+        # 1. Try extracting text using pdfium, falling back to pdfminer.six (for text-based PDFs)
+        raw_text = ""
+        pdfium_read = False
+        if pdfium is not None:
+            logger.debug("🔍 Attempting text extraction with pdfium...")
+            try:
+                raw_text = extract_text_with_pdfium(pdf_stream)
+                pdfium_read = True
+            except Exception as e:
+                logger.warning("⚠️ pdfium failed: %s", e)
+            pdf_stream.seek(0)
+
+        # pdfminer reads the same text layer, so it's only worth a try when pdfium
+        # couldn't open the file; a scanned PDF goes straight to OCR
+        if not pdfium_read and not has_meaningful_text(raw_text):
+            logger.debug("🔍 Attempting text extraction with pdfminer...")
+            raw_text = extract_text_with_pdfminer(pdf_stream)
         
         # 2. Check if we got meaningful text
-        if raw_text and raw_text.strip() and len(raw_text.strip()) > 50:
+        if has_meaningful_text(raw_text):
             clean_text = clean_text_data(raw_text)
-            print(f"✅ Successfully extracted {len(clean_text)} characters from PDF")
+            logger.info("✅ Successfully extracted %d characters from PDF", len(clean_text))
             return clean_text
         
         # 3. If no text found, try OCR for image-based PDFs
-        print("⚠️ No text found with pdfminer. Attempting OCR for image-based PDF...")
-        return extract_text_with_ocr(file_bytes)
+        logger.info("⚠️ No text found in PDF. Attempting OCR for image-based PDF...")
+        pdf_stream.seek(0)
+        return extract_text_with_ocr(pdf_stream.read())
         
     except Exception as e:
-        print(f"❌ Error parsing PDF: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error parsing PDF: %s", e)
         return ""
 
+def has_meaningful_text(text: str) -> bool:
+    """
+    True if a text layer is worth keeping (otherwise the PDF is probably scanned).
+    """
+    return bool(text) and len(text.strip()) > 50
+
+def extract_text_with_pdfium(pdf_stream: BinaryIO) -> str:
+    """
+    Extract the text layer of every page with pypdfium2.
+    Returns "" early when the first pages have no text layer (a scanned PDF).
+    """
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(pdf_stream)
+        try:
+            pages = []
+            found_text = False
+            for index, page in enumerate(pdf):
+                if index == TEXT_PROBE_PAGES and not found_text:
+                    page.close()
+                    return ""
+                textpage = page.get_textpage()
+                if textpage.count_chars() > TEXT_PROBE_MIN_CHARS:
+                    found_text = True
+                # get_text_range() covers the whole page, unlike the bounded get_text_bounded()
+                pages.append(textpage.get_text_range())
+                textpage.close()
+                page.close()
+            return "\n".join(pages)
+        finally:
+            pdf.close()
+
+def extract_text_with_pdfminer(pdf_stream: BinaryIO) -> str:
+    """
+    Extract the text layer with pdfminer.six, writing straight into a string buffer.
+    """
+    out = io.StringIO()
+    extract_text_to_fp(pdf_stream, out, laparams=_LAPARAMS, output_type="text", codec=None)
+    return out.getvalue()
+
 def extract_text_with_ocr(file_bytes: bytes) -> str:
     """
     Extract text from image-based PDFs using OCR (Optical Character Recognition).
     """
     try:
         from pdf2image import convert_from_bytes
-        import pytesseract
-        import os
         
-        # Set Tesseract path for Windows
-        pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+        page_ocr = get_page_ocr()
         
         # Set Poppler path (bundled with project)
         backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         poppler_path = os.path.join(backend_dir, "poppler", "poppler-24.08.0", "Library", "bin")
         
-        print("📄 Converting PDF to images...")
-        # Convert PDF to images
-        images = convert_from_bytes(file_bytes, poppler_path=poppler_path)
+        workers = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
         
-        print(f"🖼️ Processing {len(images)} page(s) with OCR...")
-        all_text = []
+        logger.debug("📄 Converting PDF to images...")
+        # Convert PDF to images (Poppler renders pages in parallel). Grayscale
+        # skips the RGB conversion, and the default lossless PPM/PGM output keeps
+        # JPEG artifacts out of the thresholded page Tesseract reads.
+        images = convert_from_bytes(
+            file_bytes,
+            dpi=OCR_DPI,
+            poppler_path=poppler_path,
+            thread_count=workers,
+            grayscale=True,
+        )
         
-        for i, image in enumerate(images):
-            print(f"   Processing page {i+1}/{len(images)}...")
-            text = pytesseract.image_to_string(image)
-            all_text.append(text)
+        logger.info("🖼️ Processing %d page(s) with OCR...", len(images))
+        # Each page is a separate tesseract process, so threads are enough to
+        # OCR pages in parallel (the GIL is released while waiting on them)
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(images)))) as executor:
+            all_text = list(executor.map(page_ocr, images))
         
         combined_text = "\n".join(all_text)
         clean_text = clean_text_data(combined_text)
         
-        print(f"✅ OCR extracted {len(clean_text)} characters from {len(images)} page(s)")
+        logger.info("✅ OCR extracted %d characters from %d page(s)", len(clean_text), len(images))
         return clean_text
         
     except ImportError as e:
-        print(f"❌ OCR libraries not installed: {e}")
-        print("💡 Install with: pip install pytesseract pdf2image pillow")
-        print("💡 Also install Tesseract-OCR: https://github.com/UB-Mannheim/tesseract/wiki")
+        logger.error("❌ OCR libraries not installed: %s", e)
+        logger.error("💡 Install with: pip install pytesseract pdf2image pillow")
+        logger.error("💡 Also install Tesseract-OCR: https://github.com/UB-Mannheim/tesseract/wiki")
         return "ERROR: OCR not available. Please install pytesseract and pdf2image."
     except Exception as e:
-        print(f"❌ OCR failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ OCR failed: %s", e)
         return ""
 
+def get_page_ocr() -> Callable[[Any], str]:
+    """
+    Pick the per-page OCR function for OCR_ENGINE (falls back to Tesseract).
+    """
+    if OCR_ENGINE == "rapidocr":
+        try:
+            _rapidocr_engine()
+            return ocr_page_rapidocr
+        except ImportError as e:
+            logger.warning("⚠️ RapidOCR not available (%s), falling back to Tesseract", e)
+    
+    import pytesseract
+    
+    # Set Tesseract path for Windows
+    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+    return ocr_page
+
+@lru_cache(maxsize=1)
+def _rapidocr_engine():
+    """
+    RapidOCR (ONNX Runtime) engine, loaded once; its sessions are safe to share across threads.
+    """
+    from rapidocr_onnxruntime import RapidOCR
+    
+    return RapidOCR()
+
+def ocr_page_rapidocr(image) -> str:
+    """
+    Run RapidOCR's text detector + recognizer on one rendered page.
+    """
+    import numpy as np
+    
+    result, _ = _rapidocr_engine()(np.asarray(image.convert("RGB")))
+    # Each result line is [box, text, confidence]
+    return "\n".join(line[1] for line in result or [])
+
+def ocr_page(image) -> str:
+    """
+    Binarize one rendered (grayscale) page and run Tesseract on it.
+    """
+    import pytesseract
+    
+    if image.mode != "L":
+        image = image.convert("L")
+    return pytesseract.image_to_string(image.point(_BINARIZE_TABLE, mode="1"))
+
 def clean_text_data(text: str) -> str:
     """
     Removes clutter like extra whitespace, special characters, 
     and weird PDF formatting artifacts.
     """
     # Replace multiple spaces/tabs with a single space
-    text = re.sub(r'\s+', ' ', text)
+    # (split() uses the same whitespace definition as the regex \s)
+    text = ' '.join(text.split())
     
-    # Remove non-printable characters (optional, but good for safety)
-    text = ''.join(char for char in text if char.isprintable())
+    # Remove non-printable characters (optional, but good for safety).
+    # Most text is already clean; the regex covers the usual PDF junk, and the
+    # per-char filter only runs if something rarer is left over.
+    if not text.isprintable():
+        text = _JUNK_RE.sub('', text)
+        if not text.isprintable():
+            text = ''.join(char for char in text if char.isprintable())
     
     return text.strip()
 
@@ -0,0 +1,49 @@
+"""
+One-off migration: add the lowercased skills_lc copy to user profiles written
+before /candidates/search filtered skills inside Firestore (profiles without it
+never match a skill search)
+
+Run from the backend directory: python backfill_skills_lc.py
+"""
+
+import logging
+
+from app.main import get_db
+
+logger = logging.getLogger("backfill_skills_lc")
+
+# Firestore's limit on writes per batch
+BATCH_SIZE = 500
+
+def backfill_skills_lc() -> int:
+    """Write skills_lc wherever it's missing or out of date, returns the number of profiles updated"""
+    db = get_db()
+    if db is None:
+        raise SystemExit("❌ Database not initialized")
+
+    updated = 0
+    batch = db.batch()
+    pending = 0
+    for doc in db.collection("users").select(["skills", "skills_lc"]).stream():
+        data = doc.to_dict() or {}
+        if "skills" not in data:
+            continue
+        skills_lc = [s.lower() for s in data["skills"] or []]
+        if data.get("skills_lc") == skills_lc:
+            continue
+
+        batch.update(doc.reference, {"skills_lc": skills_lc})
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            updated += pending
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+        updated += pending
+    return updated
+
+if __name__ == "__main__":
+    logger.info("✅ Backfilled skills_lc on %d profiles", backfill_skills_lc())
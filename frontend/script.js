@@ -107,19 +107,19 @@ async function uploadFile(file) {
         statusDiv.style.color = "green";
         
         resultBox.classList.remove('hidden');
-        const analysis = data?.ai_analysis || {};
+        const analysis = data || {};
         
         if (summaryName) {
             summaryName.textContent = analysis.candidate_name || "Unknown";
         }
         if (summaryExp) {
-            summaryExp.textContent = analysis.experience_years !== undefined
+            summaryExp.textContent = analysis.experience_years != null
                 ? `${analysis.experience_years} years`
                 : "N/A";
         }
         if (summaryScore) {
-            summaryScore.textContent = analysis.resume_quality_score !== undefined
-                ? `${analysis.resume_quality_score}/10`
+            summaryScore.textContent = analysis.quality_score != null
+                ? `${analysis.quality_score}/10`
                 : "N/A";
         }
 
@@ -4,6 +4,7 @@ AI Resume Analyzer Launcher
 Starts both backend and opens frontend in one command
 """
 
+import socket
 import subprocess
 import time
 import webbrowser
@@ -11,6 +12,22 @@ import os
 import signal
 import sys
 
+BACKEND_ADDRESS = ("localhost", 8000)
+STARTUP_TIMEOUT = 30  # seconds
+
+def wait_for_server(process, timeout=STARTUP_TIMEOUT):
+    """Poll the backend port until it accepts connections (False if it exits or times out)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            socket.create_connection(BACKEND_ADDRESS, timeout=0.1).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
 def main():
     print("🚀 Starting AI Resume Analyzer...")
     print()
@@ -19,15 +36,20 @@ def main():
     backend_dir = r"D:\Projects\AI Resume\backend"
     os.chdir(backend_dir)
 
-    # Start backend server
+    # Start backend server (its logs go straight to this console; a pipe
+    # nobody reads would fill up and block the server)
     print("📡 Starting backend server...")
     backend_process = subprocess.Popen([
         sys.executable, "-m", "app.main"
-    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    ])
 
     # Wait for server to start
     print("⏳ Waiting for server to start...")
-    time.sleep(3)
+    if not wait_for_server(backend_process):
+        print("❌ Backend server did not start, see the output above")
+        backend_process.terminate()
+        backend_process.wait()
+        sys.exit(1)
 
     # Open frontend in browser
     frontend_url = "http://localhost:8000/static/index.html"